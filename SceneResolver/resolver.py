@@ -1,12 +1,15 @@
 """Scene resolution pipeline powered by a LangGraph-style workflow."""
 from __future__ import annotations
 
-import json
 import os
 from datetime import datetime, timedelta, timezone
+from functools import cache, lru_cache
 from itertools import count
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple, Union
+
+import orjson
 
 from . import state_store
 from .schemas import Appearance, Event, GeminiClip, PersonObservation, SceneState
@@ -15,12 +18,19 @@ from langgraph.graph import START, END, StateGraph
 
 
 _IDENTITIES_PATH = Path(os.environ.get("IDENTITIES_FILE", "Environment/identities.json")).expanduser()
-_IDENTITY_CACHE: Optional[Dict[str, Dict[str, Iterable[str]]]] = None
+_IDENTITY_CACHE: Optional[Mapping[str, Mapping[str, Iterable[str]]]] = None
+_IDENTITY_NAME_INDEX: Optional[Dict[str, str]] = None
+_IDENTITY_TOKENS: Optional[Dict[str, FrozenSet[str]]] = None
 _UNKNOWN_COUNTER = count(1)
+_IDENTITY_FIELDS = ("top", "bottom", "shoes", "notes")
+
 
+def load_identities(path: Optional[Path] = None) -> Mapping[str, Mapping[str, Iterable[str]]]:
+    """Load the appearance → identity mapping.
 
-def load_identities(path: Optional[Path] = None) -> Dict[str, Dict[str, Iterable[str]]]:
-    """Load the appearance → identity mapping."""
+    The result is read-only: the default mapping is cached and shared, and
+    the derived name index and token sets assume it never changes.
+    """
 
     global _IDENTITY_CACHE
     if path is None:
@@ -30,52 +40,88 @@ def load_identities(path: Optional[Path] = None) -> Dict[str, Dict[str, Iterable
         return _IDENTITY_CACHE
 
     try:
-        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        data = orjson.loads(Path(path).read_bytes())
     except Exception:
         data = {}
 
-    normalised: Dict[str, Dict[str, Iterable[str]]] = {}
-    for name, spec in data.items():
-        if not isinstance(spec, dict):
-            continue
-        normalised[name] = {
-            "top": tuple(str(value) for value in spec.get("top", [])),
-            "bottom": tuple(str(value) for value in spec.get("bottom", [])),
-            "shoes": tuple(str(value) for value in spec.get("shoes", [])),
-            "notes": tuple(str(value) for value in spec.get("notes", [])),
+    normalised: Mapping[str, Mapping[str, Iterable[str]]] = MappingProxyType(
+        {
+            name: MappingProxyType(
+                {field: tuple(map(str, spec.get(field, ()))) for field in _IDENTITY_FIELDS}
+            )
+            for name, spec in data.items()
+            if isinstance(spec, dict)
         }
+    )
 
     if path == _IDENTITIES_PATH:
         _IDENTITY_CACHE = normalised
     return normalised
 
 
+def _identity_name_index() -> Dict[str, str]:
+    """Map lowercased identity names to their canonical spelling."""
+
+    global _IDENTITY_NAME_INDEX
+    if _IDENTITY_NAME_INDEX is None:
+        index: Dict[str, str] = {}
+        for name in load_identities():
+            index.setdefault(name.lower(), name)
+        _IDENTITY_NAME_INDEX = index
+    return _IDENTITY_NAME_INDEX
+
+
 def _tokenise_descriptor(descriptor: str) -> List[str]:
     return [token.strip(".,").lower() for token in descriptor.split() if token.strip()]
 
 
-def _identity_tokens() -> Dict[str, List[str]]:
-    tokens: Dict[str, List[str]] = {}
-    for name, spec in load_identities().items():
-        collected: List[str] = []
-        for values in spec.values():
-            for value in values:
-                collected.extend(_tokenise_descriptor(value))
-        tokens[name] = collected
-    return tokens
+def _identity_tokens() -> Dict[str, FrozenSet[str]]:
+    """Tokenise each identity profile once and reuse the resulting sets."""
+
+    global _IDENTITY_TOKENS
+    if _IDENTITY_TOKENS is None:
+        tokens: Dict[str, FrozenSet[str]] = {}
+        for name, spec in load_identities().items():
+            collected: List[str] = []
+            for values in spec.values():
+                for value in values:
+                    collected.extend(_tokenise_descriptor(value))
+            tokens[name] = frozenset(collected)
+        _IDENTITY_TOKENS = tokens
+    return _IDENTITY_TOKENS
 
 
 def _next_unknown() -> str:
     return f"Unknown_{next(_UNKNOWN_COUNTER)}"
 
 
+@lru_cache(maxsize=4096)
+def _best_identity_for_tokens(tokens: FrozenSet[str]) -> Optional[str]:
+    """Return the single best-scoring identity for ``tokens``, if any."""
+
+    # Track the leader in a single pass; a tie at the top score is ambiguous.
+    best_name: Optional[str] = None
+    best_score = 0
+    tied = False
+    for name, profile_tokens in _identity_tokens().items():
+        score = len(tokens & profile_tokens)
+        if score > best_score:
+            best_name, best_score, tied = name, score, False
+        elif score and score == best_score:
+            tied = True
+
+    if tied:
+        return None
+    return best_name
+
+
 def resolve_identity(appearance: Appearance, hint: Optional[str] = None) -> str:
     """Resolve an appearance profile to a known identity if possible."""
 
     if hint:
-        for known in load_identities().keys():
-            if hint.strip().lower() == known.lower():
-                return known
+        known = _identity_name_index().get(hint.strip().lower())
+        if known is not None:
+            return known
 
     tokens = set(appearance.tokens())
     if hint:
@@ -84,33 +130,27 @@ def resolve_identity(appearance: Appearance, hint: Optional[str] = None) -> str:
     if not tokens:
         return _next_unknown()
 
-    scored: List[Tuple[int, str]] = []
-    for name, profile_tokens in _identity_tokens().items():
-        score = len(tokens.intersection(profile_tokens))
-        if score > 0:
-            scored.append((score, name))
+    best = _best_identity_for_tokens(frozenset(tokens))
+    if best is not None:
+        return best
+    return _next_unknown()
 
-    if not scored:
-        return _next_unknown()
 
-    scored.sort(reverse=True)
-    best_score = scored[0][0]
-    best_names = [name for score, name in scored if score == best_score]
-    if len(best_names) == 1:
-        return best_names[0]
-    return _next_unknown()
+def _alias_index(resolved: List[Tuple[str, PersonObservation]]) -> Dict[str, str]:
+    """Map lowercased pid hints and identity names to resolved identities."""
+
+    aliases: Dict[str, str] = {}
+    for identity, person in resolved:
+        if person.pid_hint:
+            aliases.setdefault(person.pid_hint.lower(), identity)
+        aliases.setdefault(identity.lower(), identity)
+    return aliases
 
 
-def _associate_people(resolved: List[Tuple[str, PersonObservation]], alias: Optional[str]) -> Optional[str]:
+def _associate_people(aliases: Dict[str, str], alias: Optional[str]) -> Optional[str]:
     if not alias:
         return None
-    alias_lower = alias.lower()
-    for identity, person in resolved:
-        if person.pid_hint and person.pid_hint.lower() == alias_lower:
-            return identity
-        if identity.lower() == alias_lower:
-            return identity
-    return alias
+    return aliases.get(alias.lower(), alias)
 
 
 def _parse_timestamp(value: Optional[object]) -> Optional[datetime]:
@@ -180,7 +220,12 @@ def _clip_time_bounds(
 
 
 def _parse_clip(state: Dict[str, object]) -> Dict[str, object]:
-    clip = GeminiClip.model_validate(state["raw_clip"])
+    raw_clip = state["raw_clip"]
+    if isinstance(raw_clip, (bytes, bytearray, str)):
+        # Raw Gemini output is parsed and validated in one pydantic-core pass.
+        clip = GeminiClip.model_validate_json(raw_clip)
+    else:
+        clip = GeminiClip.model_validate(raw_clip)
     payload = {"clip": clip}
     if "ingested_at" in state:
         payload["ingested_at"] = state["ingested_at"]
@@ -198,12 +243,15 @@ def _resolve_people(state: Dict[str, object]) -> Dict[str, object]:
     for person in clip.people:
         identity = resolve_identity(person.appearance, hint=person.pid_hint)
         resolved.append((identity, person))
-    return {"resolved_people": resolved}
+    return {"resolved_people": resolved, "people_by_alias": _alias_index(resolved)}
 
 
 def _build_events(state: Dict[str, object]) -> Dict[str, object]:
     clip: GeminiClip = state["clip"]
+    clip_id = clip.clip_id
+    room = clip.room
     resolved: List[Tuple[str, PersonObservation]] = state.get("resolved_people", [])
+    aliases: Dict[str, str] = state.get("people_by_alias", {})
     events: List[Event] = []
     ingested_at: datetime = state.get("ingested_at", datetime.utcnow())
     clip_start, clip_end = _clip_time_bounds(clip, ingested_at)
@@ -224,18 +272,20 @@ def _build_events(state: Dict[str, object]) -> Dict[str, object]:
         last_timestamp = timestamp
         return timestamp
 
+    # Every field below comes from the validated GeminiClip, so events are
+    # built with model_construct rather than re-validated one by one.
     sequence = 0
 
     for identity, person in resolved:
         for activity in person.activities:
-            event_id = f"{clip.clip_id}:{identity}:{activity}:{sequence}"
-            description = f"{identity} {activity} in room {clip.room}"
+            event_id = f"{clip_id}:{identity}:{activity}:{sequence}"
+            description = f"{identity} {activity} in room {room}"
             events.append(
-                Event(
+                Event.model_construct(
                     event_id=event_id,
                     timestamp=next_timestamp(None),
-                    clip_id=clip.clip_id,
-                    room=clip.room,
+                    clip_id=clip_id,
+                    room=room,
                     actor=identity,
                     action=activity,
                     description=description,
@@ -245,9 +295,9 @@ def _build_events(state: Dict[str, object]) -> Dict[str, object]:
             sequence += 1
 
     for obj in clip.objects:
-        holder = _associate_people(resolved, obj.picked_by)
+        holder = _associate_people(aliases, obj.picked_by)
         if obj.picked_by:
-            event_id = f"{clip.clip_id}:{obj.name}:picked:{sequence}"
+            event_id = f"{clip_id}:{obj.name}:picked:{sequence}"
             description = f"{holder or obj.picked_by} picked {obj.name}"
             offset = obj.pick_time_s if obj.pick_time_s > 0 else None
             details = {
@@ -257,11 +307,11 @@ def _build_events(state: Dict[str, object]) -> Dict[str, object]:
             if offset is not None:
                 details["clip_time_offset_s"] = offset
             events.append(
-                Event(
+                Event.model_construct(
                     event_id=event_id,
                     timestamp=next_timestamp(offset),
-                    clip_id=clip.clip_id,
-                    room=clip.room,
+                    clip_id=clip_id,
+                    room=room,
                     actor=holder,
                     action="picked",
                     description=description,
@@ -270,7 +320,7 @@ def _build_events(state: Dict[str, object]) -> Dict[str, object]:
             )
             sequence += 1
         if obj.placed_at:
-            event_id = f"{clip.clip_id}:{obj.name}:placed:{sequence}"
+            event_id = f"{clip_id}:{obj.name}:placed:{sequence}"
             description = f"{holder or obj.picked_by or 'Someone'} placed {obj.name} at {obj.placed_at}"
             # Determine offset favouring explicit placement time, falling back to pick time
             offset = None
@@ -285,11 +335,11 @@ def _build_events(state: Dict[str, object]) -> Dict[str, object]:
             if offset is not None:
                 details["clip_time_offset_s"] = offset
             events.append(
-                Event(
+                Event.model_construct(
                     event_id=event_id,
                     timestamp=next_timestamp(offset),
-                    clip_id=clip.clip_id,
-                    room=clip.room,
+                    clip_id=clip_id,
+                    room=room,
                     actor=holder,
                     action="placed",
                     description=description,
@@ -298,14 +348,14 @@ def _build_events(state: Dict[str, object]) -> Dict[str, object]:
             )
             sequence += 1
         if obj.exited_with:
-            event_id = f"{clip.clip_id}:{obj.name}:exited:{sequence}"
+            event_id = f"{clip_id}:{obj.name}:exited:{sequence}"
             description = f"{holder or obj.picked_by or 'Someone'} exited with {obj.name}"
             events.append(
-                Event(
+                Event.model_construct(
                     event_id=event_id,
                     timestamp=next_timestamp(None),
-                    clip_id=clip.clip_id,
-                    room=clip.room,
+                    clip_id=clip_id,
+                    room=room,
                     actor=holder,
                     action="exited",
                     description=description,
@@ -326,6 +376,7 @@ def _update_world(state: Dict[str, object]) -> Dict[str, object]:
     clip: GeminiClip = state["clip"]
     scene_state: SceneState = state["scene_state"]
     resolved: List[Tuple[str, PersonObservation]] = state.get("resolved_people", [])
+    aliases: Dict[str, str] = state.get("people_by_alias", {})
     events: List[Event] = state.get("events", [])
     timestamp_dt: Optional[datetime] = state.get("clip_end_time")
     if timestamp_dt is None:
@@ -335,6 +386,8 @@ def _update_world(state: Dict[str, object]) -> Dict[str, object]:
     if timestamp_dt is None:
         timestamp_dt = state.get("ingested_at", datetime.utcnow())
     timestamp = timestamp_dt.isoformat()
+    # Later events overwrite earlier ones, leaving each actor's latest action.
+    last_activity = {event.actor: event.action for event in events}
 
     for identity, person in resolved:
         person_entry = scene_state.world_state.persons.setdefault(identity, {})
@@ -348,14 +401,11 @@ def _update_world(state: Dict[str, object]) -> Dict[str, object]:
                 "metadata": clip.metadata,
             }
         )
-        if events:
-            for event in reversed(events):
-                if event.actor == identity:
-                    person_entry["last_activity"] = event.action
-                    break
+        if identity in last_activity:
+            person_entry["last_activity"] = last_activity[identity]
 
     for obj in clip.objects:
-        holder = _associate_people(resolved, obj.picked_by)
+        holder = _associate_people(aliases, obj.picked_by)
         object_entry = scene_state.world_state.objects.setdefault(obj.name, {})
         object_entry.update(
             {
@@ -378,11 +428,14 @@ def _update_world(state: Dict[str, object]) -> Dict[str, object]:
     for event in events:
         scene_state.append_event(event)
 
-    state_store.save_state(scene_state)
+    state_store.save_state(scene_state, new_events=events)
     return {"scene_state": scene_state}
 
 
-def _build_graph():
+@cache
+def _ingest_graph():
+    """Compile the ingest workflow on first use rather than at import time."""
+
     graph = StateGraph(dict)
     graph.add_node("load_state", _load_state)
     graph.add_node("parse_clip", _parse_clip)
@@ -398,17 +451,17 @@ def _build_graph():
     return graph.compile()
 
 
-_INGEST_GRAPH = _build_graph()
-
+def ingest(gemini_json: Union[bytes, str, Dict[str, object]]) -> SceneState:
+    """Public entry point to ingest Gemini JSON into the scene state.
 
-def ingest(gemini_json: Dict[str, object]) -> SceneState:
-    """Public entry point to ingest Gemini JSON into the scene state."""
+    Accepts either an already-decoded mapping or the raw JSON text/bytes.
+    """
 
     state: Dict[str, object] = {
         "raw_clip": gemini_json,
         "ingested_at": datetime.utcnow(),
     }
-    result = _INGEST_GRAPH(state)
+    result = _ingest_graph()(state)
     scene_state: SceneState = result["scene_state"]
     return scene_state
 
@@ -1,10 +1,11 @@
 """Pydantic models shared across the scene resolution workflow."""
 from __future__ import annotations
 
+from bisect import insort
 from datetime import datetime
 from typing import Dict, List, Literal, Optional
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
 
 
 ActivityLiteral = Literal["entered", "picked", "placed", "exited", "carry", "handoff"]
@@ -52,11 +53,12 @@ class AudioSummary(BaseModel):
     transcript: Optional[str] = Field(default=None)
     utterances: List[AudioUtterance] = Field(default_factory=list)
 
-    @validator("transcript", pre=True, always=True)
-    def _normalise_transcript(cls, value, values):  # noqa: D401
+    @field_validator("transcript", mode="before")
+    @classmethod
+    def _normalise_transcript(cls, value, info: ValidationInfo):  # noqa: D401
         """Ensure transcript is empty when audio is not present."""
 
-        present = values.get("present", False)
+        present = info.data.get("present", False)
         if not present:
             return None
         if isinstance(value, str):
@@ -87,6 +89,12 @@ class Event(BaseModel):
     details: Dict[str, object] = Field(default_factory=dict)
 
 
+def event_sort_key(event: Event) -> datetime:
+    """Ordering key for SceneState.timeline, shared by inserts and reloads."""
+
+    return event.timestamp
+
+
 class SceneWorldState(BaseModel):
     objects: Dict[str, Dict[str, object]] = Field(default_factory=dict)
     persons: Dict[str, Dict[str, object]] = Field(default_factory=dict)
@@ -97,10 +105,8 @@ class SceneState(BaseModel):
     world_state: SceneWorldState = Field(default_factory=SceneWorldState)
 
     def append_event(self, event: Event) -> None:
-        timeline = list(self.timeline)
-        timeline.append(event)
-        timeline.sort(key=lambda item: item.timestamp)
-        self.timeline = timeline
+        # The timeline is kept ordered, so insert in place rather than re-sorting.
+        insort(self.timeline, event, key=event_sort_key)
 
     def model_dump_dict(self) -> Dict[str, object]:
         return self.model_dump(mode="python")
@@ -117,4 +123,5 @@ __all__ = [
     "PersonObservation",
     "SceneState",
     "SceneWorldState",
+    "event_sort_key",
 ]
@@ -1,14 +1,22 @@
 """Simple file-backed scene state persistence."""
 from __future__ import annotations
 
-import json
 import os
+import sys
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-from .schemas import SceneState
+import orjson
+
+from .schemas import Event, SceneState, SceneWorldState, event_sort_key
 
 _STATE_PATH = Path(os.environ.get("STATE_PATH", "./data/state.json")).expanduser()
+# The state file is written by save_state, so full validation on load is opt-in.
+_VALIDATE_ON_LOAD = os.environ.get("SCENE_RESOLVER_VALIDATE", "") == "1"
+_INTERNED_EVENT_FIELDS = ("clip_id", "room", "actor", "action")
+# Timelines that held unreadable entries at load; the next save rewrites them.
+_TIMELINES_NEEDING_REWRITE: Set[Path] = set()
 
 
 def _ensure_directory(path: Path) -> None:
@@ -19,33 +27,181 @@ def _ensure_directory(path: Path) -> None:
         pass
 
 
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Write ``data`` to ``path`` so readers never observe a partial file."""
+
+    tmp = path.with_suffix(path.suffix + f".tmp.{os.getpid()}")
+    try:
+        with tmp.open("wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _timeline_path(state_path: Path) -> Path:
+    """Timeline events are stored as JSON Lines next to the state file."""
+
+    return state_path.with_suffix(".timeline.jsonl")
+
+
+def _read_timeline(path: Path) -> Tuple[List[Dict[str, object]], bool]:
+    """Return the decodable timeline entries and whether any line was dropped."""
+
+    if not path.exists():
+        return [], False
+
+    entries: List[Dict[str, object]] = []
+    dropped = False
+    with path.open("rb") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                entries.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                # An interrupted append can leave a partial trailing line.
+                dropped = True
+    return entries, dropped
+
+
+def _serialise_timeline(events: Iterable[Event]) -> bytes:
+    return b"".join(
+        orjson.dumps(event.model_dump(mode="python"), default=str) + b"\n"
+        for event in events
+    )
+
+
+def _append_timeline(path: Path, events: Iterable[Event]) -> None:
+    data = _serialise_timeline(events)
+    with path.open("r+b") as handle:
+        end = handle.seek(0, os.SEEK_END)
+        if end:
+            handle.seek(end - 1)
+            if handle.read(1) != b"\n":
+                # Terminate a partial line left by an interrupted append so the
+                # first new event does not get glued onto it.
+                data = b"\n" + data
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _construct_event(raw: Dict[str, object]) -> Event:
+    # ``raw`` is freshly decoded and owned by the caller, so it is updated in place.
+    timestamp = raw.get("timestamp")
+    if isinstance(timestamp, str):
+        timestamp = raw["timestamp"] = datetime.fromisoformat(timestamp)
+    # model_construct does not check required fields, and the timeline is
+    # sorted on this one.
+    if not isinstance(timestamp, datetime):
+        raise ValueError("timeline entry has no timestamp")
+    # These values repeat across most of the timeline; share one copy of each.
+    for key in _INTERNED_EVENT_FIELDS:
+        value = raw.get(key)
+        if isinstance(value, str):
+            raw[key] = sys.intern(value)
+    return Event.model_construct(**raw)
+
+
+def _load_events(entries: Iterable[object]) -> Tuple[List[Event], bool]:
+    """Build events one entry at a time so a bad entry only loses itself."""
+
+    build = Event.model_validate if _VALIDATE_ON_LOAD else _construct_event
+    events: List[Event] = []
+    dropped = False
+    for raw in entries:
+        try:
+            events.append(build(raw))
+        except Exception:
+            dropped = True
+    return events, dropped
+
+
+def _load_world_state(raw: object) -> SceneWorldState:
+    try:
+        if _VALIDATE_ON_LOAD:
+            return SceneWorldState.model_validate(raw or {})
+        return SceneWorldState.model_construct(**(raw or {}))
+    except Exception:
+        return SceneWorldState()
+
+
 def load_state(path: Optional[Path] = None) -> SceneState:
-    """Load a scene state from disk."""
+    """Load a scene state from disk.
+
+    Unreadable timeline entries are skipped rather than discarding the whole
+    state, and the next save rewrites the timeline without them.
+    """
 
     target = Path(path) if path is not None else _STATE_PATH
-    if not target.exists():
+    timeline_path = _timeline_path(target)
+    if not target.exists() and not timeline_path.exists():
         return SceneState()
 
     try:
-        with target.open("r", encoding="utf-8") as handle:
-            payload = json.load(handle)
+        payload = orjson.loads(target.read_bytes()) if target.exists() else {}
     except Exception:
-        return SceneState()
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
 
     try:
-        return SceneState.model_validate(payload)
-    except Exception:
-        return SceneState()
+        entries, dropped_lines = _read_timeline(timeline_path)
+    except OSError:
+        return SceneState(world_state=_load_world_state(payload.get("world_state")))
+
+    # Older state files keep the timeline inline rather than in JSON Lines.
+    inline = payload.get("timeline")
+    if isinstance(inline, list):
+        entries = inline + entries
+    timeline, dropped_events = _load_events(entries)
 
+    if dropped_lines or dropped_events:
+        _TIMELINES_NEEDING_REWRITE.add(timeline_path.resolve())
 
-def save_state(state: SceneState, path: Optional[Path] = None) -> None:
-    """Persist a scene state to disk."""
+    # Events are appended in ingest order; clips may arrive out of order.
+    timeline.sort(key=event_sort_key)
+    return SceneState.model_construct(
+        timeline=timeline,
+        world_state=_load_world_state(payload.get("world_state")),
+    )
+
+
+def save_state(
+    state: SceneState,
+    path: Optional[Path] = None,
+    *,
+    new_events: Optional[Iterable[Event]] = None,
+) -> None:
+    """Persist a scene state to disk.
+
+    The world state is rewritten on every call while the timeline lives in
+    an append-only JSON Lines file. Pass ``new_events`` to append only those
+    events; otherwise the full timeline is rewritten.
+    """
 
     target = Path(path) if path is not None else _STATE_PATH
     _ensure_directory(target)
-    serialised = state.model_dump(mode="json", by_alias=False)
-    with target.open("w", encoding="utf-8") as handle:
-        json.dump(serialised, handle, indent=2)
+    timeline_path = _timeline_path(target)
+    rewrite = timeline_path.resolve() in _TIMELINES_NEEDING_REWRITE
+    if new_events is not None and timeline_path.exists() and not rewrite:
+        # Appends cannot use _atomic_write. A crash can leave at most one partial
+        # last line, which _append_timeline terminates before the next write.
+        _append_timeline(timeline_path, new_events)
+    else:
+        _atomic_write(timeline_path, _serialise_timeline(state.timeline))
+        _TIMELINES_NEEDING_REWRITE.discard(timeline_path.resolve())
+
+    serialised = orjson.dumps(
+        {"world_state": state.world_state.model_dump(mode="python", by_alias=False)},
+        option=orjson.OPT_INDENT_2,
+        default=str,
+    )
+    _atomic_write(target, serialised)
 
 
 __all__ = ["load_state", "save_state"]
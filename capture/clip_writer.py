@@ -248,9 +248,8 @@ class ClipWriter:
                     continue
 
                 if isinstance(analysis_result, Mapping):
+                    # ``metadata`` was already folded into context.metadata above.
                     merged = dict(context.metadata)
-                    if metadata:
-                        merged.update(metadata)
                     merged.setdefault("camera_name", camera_name)
                     merged.setdefault("room", str(room))
                     analysis_result["metadata"] = merged
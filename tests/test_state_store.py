@@ -0,0 +1,76 @@
+"""Tests for the file-backed scene state store."""
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from SceneResolver.schemas import Event, SceneState
+from SceneResolver.state_store import load_state, save_state
+
+
+def _event(event_id: str, second: int) -> Event:
+    return Event(
+        event_id=event_id,
+        timestamp=datetime(2024, 1, 1, 10, 0, second),
+        clip_id="clip-1",
+        room="A",
+        actor="Amogh",
+        action="picked",
+        description=f"Amogh picked cup ({event_id})",
+    )
+
+
+def test_append_after_partial_trailing_line_keeps_new_events(tmp_path):
+    state_path = tmp_path / "state.json"
+    state = SceneState()
+    first = _event("first", 0)
+    state.append_event(first)
+    save_state(state, state_path)
+
+    # Simulate a crash part-way through appending an event.
+    timeline_path = state_path.with_suffix(".timeline.jsonl")
+    with timeline_path.open("ab") as handle:
+        handle.write(b'{"event_id":"interrupted","timest')
+
+    new_events = [_event("second", 1), _event("third", 2)]
+    for event in new_events:
+        state.append_event(event)
+    save_state(state, state_path, new_events=new_events)
+
+    loaded = load_state(state_path)
+    assert [event.event_id for event in loaded.timeline] == ["first", "second", "third"]
+
+
+@pytest.mark.parametrize(
+    "bad_line",
+    [
+        b'{"event_id":"bad","timestamp":"not-a-date"}\n',
+        b'{"event_id":"bad","clip_id":"clip-1","room":"A","action":"picked"}\n',
+    ],
+    ids=["invalid-timestamp", "missing-timestamp"],
+)
+def test_invalid_timeline_entry_is_skipped_and_rewritten(tmp_path, bad_line):
+    state_path = tmp_path / "state.json"
+    state = SceneState()
+    state.append_event(_event("first", 0))
+    state.world_state.objects["cup"] = {"room": "A"}
+    save_state(state, state_path)
+
+    timeline_path = state_path.with_suffix(".timeline.jsonl")
+    with timeline_path.open("ab") as handle:
+        handle.write(bad_line)
+
+    loaded = load_state(state_path)
+    assert [event.event_id for event in loaded.timeline] == ["first"]
+    assert loaded.world_state.objects == {"cup": {"room": "A"}}
+
+    second = _event("second", 1)
+    loaded.append_event(second)
+    save_state(loaded, state_path, new_events=[second])
+
+    assert b'"bad"' not in timeline_path.read_bytes()
+    reloaded = load_state(state_path)
+    assert [event.event_id for event in reloaded.timeline] == ["first", "second"]